@@ -12,10 +12,27 @@ Author: ExploreAI
 Date: 2024
 """
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.request import urlopen
 import logging
+import os
 import pandas as pd
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
+
+try:
+    import connectorx as cx
+except ImportError:
+    cx = None
+
 # Name our logger so we know that logs from this module come from the data_ingestion module
 logger = logging.getLogger('data_ingestion')
 
@@ -24,10 +41,19 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 
 
 
+@lru_cache(maxsize=None)
 def create_db_engine(db_path):
     """
     Creates a database engine connection to the SQLite database.
 
+    Engines are cached per db_path, so repeated calls share one engine and its
+    connection pool. No test connection is opened here: connections are checked
+    with a pre-ping when taken from the pool, and a database that cannot be
+    reached fails on the first query instead.
+
+    In-memory SQLite databases keep SQLAlchemy's default pool, which shares a
+    single connection so every query sees the same database.
+
     Parameters:
     -----------
     db_path : str
@@ -43,13 +69,14 @@ def create_db_engine(db_path):
     ImportError
         If SQLAlchemy is not installed in the environment.
     Exception
-        If the database connection fails for any other reason.
+        If the engine cannot be created for any other reason.
     """
     try:
-        engine = create_engine(db_path)
-        # Test connection
-        with engine.connect() as conn:
-            pass
+        url = make_url(db_path)
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            engine = create_engine(db_path)
+        else:
+            engine = create_engine(db_path, poolclass=QueuePool, pool_size=4, pool_pre_ping=True)
         logger.info("Database engine created successfully.")
         return engine
     except ImportError:
@@ -59,16 +86,84 @@ def create_db_engine(db_path):
         logger.error(f"Failed to create database engine. Error: {e}")
         raise e
 
-def query_data(engine, sql_query):
+def connectorx_uri(engine):
+    """
+    Builds the ConnectorX connection string for a SQLAlchemy engine.
+
+    Parameters:
+    -----------
+    engine : sqlalchemy.engine.base.Engine
+        A SQLAlchemy engine object connected to the database.
+
+    Returns:
+    --------
+    str or None
+        The connection string. SQLite databases are given as an absolute path,
+        which ConnectorX requires, and driver suffixes such as '+psycopg2' are
+        dropped. None for in-memory SQLite databases, which ConnectorX cannot open.
+    """
+    url = engine.url
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return None
+        return 'sqlite://' + os.path.abspath(url.database)
+    return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=False)
+
+def read_sql_arrow(engine, sql_query, partition_on=None):
+    """
+    Reads the result of a SQL query into an Arrow table with ConnectorX.
+
+    Parameters:
+    -----------
+    engine : sqlalchemy.engine.base.Engine
+        A SQLAlchemy engine object connected to the database.
+    sql_query : str
+        A valid SQL query string to execute on the database.
+    partition_on : str, optional
+        Numeric column ConnectorX uses to split the query into one partition per
+        CPU core. Ignored for SQLite, which ConnectorX reads with a single reader.
+
+    Returns:
+    --------
+    pyarrow.Table or None
+        The query result, or None if ConnectorX is not installed, cannot open
+        the database or fails on the query (e.g. it cannot infer the type of an
+        all-NULL SQLite column). Callers then read the query with SQLAlchemy.
+    """
+    uri = connectorx_uri(engine) if cx is not None else None
+    if uri is None:
+        return None
+    partition = {}
+    if partition_on and engine.dialect.name != 'sqlite':
+        partition = {'partition_on': partition_on, 'partition_num': os.cpu_count()}
+    try:
+        return cx.read_sql(uri, sql_query, return_type='arrow', **partition)
+    except Exception as e:
+        logger.warning(f"ConnectorX could not run the query, reading it with SQLAlchemy instead. Error: {e}")
+        return None
+
+def query_data(engine, sql_query, chunksize=50_000, partition_on=None):
     """
     Executes a SQL query against the database and returns the results as a DataFrame.
 
+    When read_sql_arrow can read the query with ConnectorX, the result is
+    converted from Arrow to pandas once, without going through Python row
+    tuples. Otherwise rows are streamed from the database in chunks and
+    concatenated at the end, so the full result set is never buffered as row
+    tuples all at once.
+
     Parameters:
     -----------
     engine : sqlalchemy.engine.base.Engine
         A SQLAlchemy engine object connected to the database.
     sql_query : str
         A valid SQL query string to execute on the database.
+    chunksize : int, optional
+        Number of rows fetched from the database per chunk when ConnectorX is
+        not used. Defaults to 50,000.
+    partition_on : str, optional
+        Numeric column ConnectorX uses to split the query into one partition per
+        CPU core. Ignored for SQLite, which ConnectorX reads with a single reader.
 
     Returns:
     --------
@@ -83,8 +178,13 @@ def query_data(engine, sql_query):
         If the query execution fails for any other reason.
     """
     try:
-        with engine.connect() as connection:
-            df = pd.read_sql_query(text(sql_query), connection)
+        table = read_sql_arrow(engine, sql_query, partition_on=partition_on)
+        if table is not None:
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+        else:
+            with engine.connect().execution_options(stream_results=True) as connection:
+                chunks = list(pd.read_sql_query(text(sql_query), connection, chunksize=chunksize))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
         if df.empty:
             msg = "The query returned an empty DataFrame."
             logger.error(msg)
@@ -98,14 +198,126 @@ def query_data(engine, sql_query):
         logger.error(f"An error occurred while querying the database. Error: {e}")
         raise e
 
-def read_from_web_CSV(URL):
+def downcast_numeric(df):
+    """
+    Downcasts numeric columns of a DataFrame to the smallest type that holds their values.
+
+    Integer columns are downcast losslessly (e.g. int64 to int32 or int16). Float
+    columns are downcast to float32, which keeps about seven significant digits.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to downcast.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The same DataFrame with its numeric columns downcast.
+    """
+    for column in df.select_dtypes(include='integer').columns:
+        df[column] = pd.to_numeric(df[column], downcast='integer')
+    for column in df.select_dtypes(include='float').columns:
+        df[column] = pd.to_numeric(df[column], downcast='float')
+    logger.info("Numeric columns downcast.")
+    return df
+
+@contextmanager
+def open_arrow_csv(URL, column_types, usecols):
+    """
+    Opens a PyArrow streaming CSV reader on a web URL or a local path.
+
+    Parameters:
+    -----------
+    URL : str
+        The complete web URL or file path pointing to a CSV file.
+    column_types : dict
+        Mapping of column name to pyarrow.DataType for columns that are not inferred.
+    usecols : list or None
+        Names of the columns to read, or None for all columns.
+
+    Yields:
+    -------
+    pyarrow.csv.CSVStreamingReader
+        A reader whose schema is inferred from the first block of the file.
+    """
+    read_options = pacsv.ReadOptions(use_threads=True)
+    convert_options = pacsv.ConvertOptions(
+        column_types=column_types,
+        include_columns=usecols,
+        strings_can_be_null=True,
+    )
+    if URL.startswith(('http://', 'https://')):
+        with urlopen(URL) as response:
+            yield pacsv.open_csv(response, read_options=read_options, convert_options=convert_options)
+    else:
+        yield pacsv.open_csv(URL, read_options=read_options, convert_options=convert_options)
+
+def read_arrow_csv(URL, column_types=None, usecols=None):
+    """
+    Reads a CSV file with PyArrow's streaming reader into a pandas DataFrame.
+
+    Parameters:
+    -----------
+    URL : str
+        The complete web URL or file path pointing to a CSV file.
+    column_types : dict, optional
+        Mapping of column name to type name for columns whose type should not be inferred.
+    usecols : list, optional
+        Names of the columns to read.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        A DataFrame containing the data from the CSV file.
+
+    Raises:
+    -------
+    pyarrow.ArrowInvalid
+        If the file is empty or a value cannot be converted to its column's type.
+    """
+    types = {name: pa.type_for_alias(alias) for name, alias in (column_types or {}).items()}
+    table = None
+    with open_arrow_csv(URL, types, usecols) as reader:
+        temporal = {
+            field.name: pa.string() for field in reader.schema
+            if pa.types.is_temporal(field.type) and field.name not in types
+        }
+        if not temporal:
+            table = reader.read_all()
+    if table is None:
+        with open_arrow_csv(URL, {**types, **temporal}, usecols) as reader:
+            table = reader.read_all()
+    if usecols is None:
+        # Name blank headers the way pandas does, e.g. a saved index column
+        table = table.rename_columns([name or f"Unnamed: {i}" for i, name in enumerate(table.column_names)])
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def read_from_web_CSV(URL, column_types=None, usecols=None):
     """
     Reads a CSV file from a web URL into a pandas DataFrame.
 
+    The file is parsed as a stream so the whole body is never buffered before
+    parsing. When PyArrow is installed its streaming CSV reader consumes the
+    response block by block and the result is converted to pandas once.
+    Otherwise pandas.read_csv reads the file in chunks that are concatenated
+    at the end.
+
+    The PyArrow result matches pandas.read_csv: empty fields are missing values
+    and columns PyArrow would parse as dates, times or timestamps are kept as
+    strings (the file is reopened once with those columns typed as strings).
+    If PyArrow cannot convert a later block to the types it inferred from the
+    first one, the file is read again with pandas.
+
     Parameters:
     -----------
     URL : str
         The complete web URL pointing to a CSV file.
+    column_types : dict, optional
+        Mapping of column name to type name (e.g. {'Field_ID': 'int32'}) for
+        columns whose type should not be inferred. Columns not in the file are ignored.
+    usecols : list, optional
+        Names of the columns to read. Other columns are skipped while parsing.
 
     Returns:
     --------
@@ -120,7 +332,15 @@ def read_from_web_CSV(URL):
         If the file cannot be read for any other reason.
     """
     try:
-        df = pd.read_csv(URL)
+        df = None
+        if pacsv is not None:
+            try:
+                df = read_arrow_csv(URL, column_types, usecols)
+            except pa.ArrowInvalid as e:
+                logger.warning(f"PyArrow could not parse the CSV file, reading it with pandas instead. Error: {e}")
+        if df is None:
+            reader = pd.read_csv(URL, dtype=column_types, usecols=usecols, chunksize=100_000)
+            df = pd.concat(reader, ignore_index=True)
         logger.info("CSV file read successfully from the web.")
         return df
     except pd.errors.EmptyDataError as e:
@@ -12,13 +12,32 @@ The class implements a pipeline for:
 - Applying data corrections (absolute elevations, crop name fixes)
 - Merging weather station mapping data
 
+The pipeline runs on pandas by default. Setting 'backend' to 'polars' in the
+configuration runs the same steps on a Polars LazyFrame, which is only
+materialised once at the end of process(). Setting it to 'duckdb' pushes the
+whole of process() down into a single DuckDB query over the SQLite database
+and the weather mapping CSV.
+
 Author: ExploreAI
 Date: 2024
 """
 
+import hashlib
+import os
 import pandas as pd
 import logging
-from data_ingestion import create_db_engine, query_data, read_from_web_CSV
+from sqlalchemy.engine import make_url
+from data_ingestion import create_db_engine, query_data, read_from_web_CSV, downcast_numeric, read_sql_arrow
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
 
 
 class FieldDataProcessor:
@@ -34,8 +53,11 @@ class FieldDataProcessor:
         columns_to_rename (dict): Mapping for swapping column names
         values_to_rename (dict): Mapping for correcting crop name spellings
         weather_map_data (str): URL or path to weather station mapping CSV
+        backend (str): Engine used by the pipeline ('pandas', 'polars' or 'duckdb')
+        cache_dir (str): Directory for Parquet copies of the SQL query result, or None.
+                         Only used for databases stored in a local file
         logger (logging.Logger): Logger instance for the class
-        df (pd.DataFrame): Processed DataFrame
+        df (pd.DataFrame | pl.LazyFrame | pl.DataFrame): Processed DataFrame
         engine: SQLAlchemy database engine
     """
 
@@ -52,9 +74,29 @@ class FieldDataProcessor:
         self.columns_to_rename = config_params['columns_to_rename']
         self.values_to_rename = config_params['values_to_rename']
         self.weather_map_data = config_params['weather_mapping_csv']
+        self.backend = config_params.get('backend', 'pandas')
+        self.cache_dir = config_params.get('cache_dir')
 
         self.initialize_logging(logging_level)
 
+        if self.backend not in ("pandas", "polars", "duckdb"):
+            msg = f"Unknown backend '{self.backend}'. Expected 'pandas', 'polars' or 'duckdb'."
+            self.logger.error(msg)
+            raise ValueError(msg)
+        if self.backend == "polars" and pl is None:
+            self.logger.error("Polars is required for the polars backend. Please install it first.")
+            raise ImportError("polars is not installed")
+        if self.backend == "duckdb" and duckdb is None:
+            self.logger.error("DuckDB is required for the duckdb backend. Please install it first.")
+            raise ImportError("duckdb is not installed")
+
+        # A cache can only be checked against a database file's modification time,
+        # so for anything else it would be written on every run and never read
+        db_url = make_url(self.db_path)
+        if self.cache_dir and not (db_url.database and os.path.isfile(db_url.database)):
+            self.logger.info(f"Query caching is disabled for {db_url}, which is not a local database file.")
+            self.cache_dir = None
+
         # We create empty objects to store the DataFrame and engine in
         self.df = None
         self.engine = None
@@ -90,81 +132,342 @@ class FieldDataProcessor:
             ch.setFormatter(formatter)
             self.logger.addHandler(ch)
 
-    def ingest_sql_data(self):
+    def ingest_sql_data(self, chunksize=50_000, partition_on='Field_ID'):
         """
         Load data from SQLite database using configured query.
 
         Creates database engine, executes query, and stores result in self.df.
+        With the pandas backend numeric columns are downcast (e.g. to int32 and
+        float32) so later steps move half as many bytes. With the polars backend
+        the result is stored as a LazyFrame.
+
+        If cache_dir is configured and the database is a local file, the raw
+        query result is also written to a Parquet file keyed on db_path and
+        sql_query. Later runs read that file instead of querying the database,
+        for as long as it is newer than the SQLite file. The file holds the types returned by the database, so every
+        backend can share it, and the pandas downcast is applied after loading.
+
+        Parameters:
+            chunksize (int): Number of rows streamed from the database per chunk
+                (pandas backend only)
+            partition_on (str): Numeric column used to read the query in parallel
+                partitions with ConnectorX (not used for SQLite)
 
         Returns:
-            pd.DataFrame: The loaded DataFrame
+            pd.DataFrame | pl.LazyFrame: The loaded DataFrame
         """
+        if self.backend == "polars":
+            self.df = self._ingest_lazy(partition_on)
+            return self.df
+
+        cache_path = self.sql_cache_path()
+        if cache_path is not None and self.is_cache_fresh(cache_path):
+            self.df = downcast_numeric(pd.read_parquet(cache_path, engine='pyarrow'))
+            self.logger.info(f"Successfully loaded data from cache: {cache_path}")
+            return self.df
+
         self.engine = create_db_engine(self.db_path)
-        self.df = query_data(self.engine, self.sql_query)
+        df = query_data(self.engine, self.sql_query, chunksize=chunksize, partition_on=partition_on)
+        if cache_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_parquet(cache_path, engine='pyarrow', compression='zstd')
+        self.df = downcast_numeric(df)
         self.logger.info("Successfully loaded data.")
         return self.df
 
+    def _ingest_lazy(self, partition_on='Field_ID'):
+        """
+        Polars version of ingest_sql_data that returns a LazyFrame.
+
+        Parameters:
+            partition_on (str): Numeric column used to read the query in parallel
+                partitions with ConnectorX (not used for SQLite)
+
+        Returns:
+            pl.LazyFrame: The query result, scanned from the cache when it is fresh
+        """
+        cache_path = self.sql_cache_path()
+        if cache_path is not None and self.is_cache_fresh(cache_path):
+            self.logger.info(f"Successfully loaded data from cache: {cache_path}")
+            return pl.scan_parquet(cache_path)
+
+        self.engine = create_db_engine(self.db_path)
+        table = read_sql_arrow(self.engine, self.sql_query, partition_on=partition_on)
+        if table is not None:
+            df = pl.from_arrow(table)
+        else:
+            with self.engine.connect() as connection:
+                df = pl.read_database(self.sql_query, connection)
+        if df.is_empty():
+            msg = "The query returned an empty DataFrame."
+            self.logger.error(msg)
+            raise ValueError(msg)
+        if cache_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.write_parquet(cache_path, compression='zstd')
+        self.logger.info("Successfully loaded data.")
+        return df.lazy()
+
+    def sql_cache_path(self):
+        """
+        Path of the Parquet cache file for the configured database and query.
+
+        Returns:
+            str: Path inside cache_dir, or None if caching is disabled
+        """
+        if not self.cache_dir:
+            return None
+        key = hashlib.sha1((self.db_path + self.sql_query).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def is_cache_fresh(self, cache_path):
+        """
+        Check whether a cache file exists and is newer than the SQLite database.
+
+        Databases that are not local files cannot be checked, so their cache
+        is always treated as stale.
+
+        Parameters:
+            cache_path (str): Path of the Parquet cache file
+
+        Returns:
+            bool: True if the cache file can be used
+        """
+        db_file = make_url(self.db_path).database
+        if not os.path.exists(cache_path) or not db_file or not os.path.exists(db_file):
+            return False
+        return os.path.getmtime(cache_path) > os.path.getmtime(db_file)
+
     def rename_columns(self):
         """
         Swap column names based on columns_to_rename configuration.
 
-        Uses a temporary column name to safely swap two column labels.
+        Both labels are swapped in a single rename, since pandas and Polars
+        apply a rename mapping to all columns at once.
         """
+        if self.backend == "polars":
+            self.df = self._rename_lazy(self.df)
+            return
+
         # Extract the columns to rename from the configuration
         column1, column2 = list(self.columns_to_rename.keys())[0], list(self.columns_to_rename.values())[0]
+        self.df.rename(columns={column1: column2, column2: column1}, inplace=True)
+
+        self.logger.info(f"Swapped columns: {column1} with {column2}")
 
-        # Temporarily rename one of the columns to avoid a naming conflict
-        temp_name = "__temp_name_for_swap__"
-        while temp_name in self.df.columns:
-            temp_name += "_"
+    def _rename_lazy(self, lf):
+        """
+        Polars version of rename_columns.
 
-        # Perform the swap
-        self.df = self.df.rename(columns={column1: temp_name, column2: column1})
-        self.df = self.df.rename(columns={temp_name: column2})
+        Parameters:
+            lf (pl.LazyFrame): Frame to rename
 
+        Returns:
+            pl.LazyFrame: The frame with the configured columns swapped
+        """
+        column1, column2 = list(self.columns_to_rename.keys())[0], list(self.columns_to_rename.values())[0]
         self.logger.info(f"Swapped columns: {column1} with {column2}")
+        return lf.rename({column1: column2, column2: column1})
 
     def apply_corrections(self, column_name='Crop_type', abs_column='Elevation'):
         """
         Apply data corrections to specified columns.
 
         Converts elevation values to absolute (positive) values and corrects
-        crop name spellings using values_to_rename dictionary.
+        crop name spellings using values_to_rename dictionary. With the pandas
+        backend the crop column is stored as a Categorical, so the corrections
+        are applied to the distinct crop names rather than to every row.
 
         Parameters:
             column_name (str): Name of the crop type column
             abs_column (str): Name of the elevation column
         """
+        if self.backend == "polars":
+            self.df = self._corrections_lazy(self.df, column_name, abs_column)
+            return
+
         self.df[abs_column] = self.df[abs_column].abs()
-        self.df[column_name] = self.df[column_name].apply(
-            lambda crop: self.values_to_rename.get(crop, crop)
+        # rename_categories cannot merge a misspelling into a category that already
+        # exists, so map the (few) categories and let astype rebuild the codes
+        crops = self.df[column_name].astype('category')
+        corrections = {crop: self.values_to_rename.get(crop, crop) for crop in crops.cat.categories}
+        self.df[column_name] = crops.map(corrections).astype('category')
+
+    def _corrections_lazy(self, lf, column_name='Crop_type', abs_column='Elevation'):
+        """
+        Polars version of apply_corrections.
+
+        Parameters:
+            lf (pl.LazyFrame): Frame to correct
+            column_name (str): Name of the crop type column
+            abs_column (str): Name of the elevation column
+
+        Returns:
+            pl.LazyFrame: The frame with corrected elevations and crop names
+        """
+        return lf.with_columns(
+            pl.col(abs_column).abs(),
+            pl.col(column_name).replace(self.values_to_rename),
         )
 
     def weather_station_mapping(self):
         """
         Merge weather station mapping data with main DataFrame.
 
-        Reads weather station mapping CSV and merges with self.df on Field_ID.
-        The resulting 'Weather_station' column contains station IDs.
+        Reads weather station mapping CSV and adds each field's station to
+        self.df by Field_ID. Every field maps to exactly one station, so with
+        the pandas backend this is a Series.map lookup on a Field_ID-indexed
+        Series rather than a full merge. With the polars backend the CSV is
+        scanned lazily and joined without passing through pandas. The resulting
+        'Weather_station' column contains station IDs.
 
         Returns:
-            pd.DataFrame: The weather station mapping DataFrame
+            pd.DataFrame | pl.LazyFrame: The Field_ID and Weather_station columns
+                                         of the mapping data
         """
+        if self.backend == "polars":
+            weather_lf = self._scan_weather_mapping()
+            self.df = self._join_lazy(self.df, weather_lf)
+            return weather_lf
+
         # Read the weather station mapping data
-        weather_mapping_df = read_from_web_CSV(self.weather_map_data)
-
-        # Merge with main DataFrame
-        self.df = pd.merge(
-            self.df,
-            weather_mapping_df[['Field_ID', 'Weather_station']],
-            on='Field_ID',
-            how='left'
-        )
+        weather_mapping_df = self._read_weather_mapping()
+
+        # Look up each field's station without copying the main DataFrame
+        weather_idx = weather_mapping_df.set_index('Field_ID')['Weather_station']
+        self.df['Weather_station'] = self.df['Field_ID'].map(weather_idx)
 
         self.logger.info("Weather station mapping completed successfully.")
         return weather_mapping_df
 
-    def process(self):
+    def _read_weather_mapping(self):
+        """
+        Read the Field_ID and Weather_station columns of the mapping CSV with
+        compact types. The other columns are never loaded.
+
+        Returns:
+            pd.DataFrame: The weather station mapping data
+        """
+        return read_from_web_CSV(
+            self.weather_map_data,
+            column_types={'Field_ID': 'int32', 'Weather_station': 'int16'},
+            usecols=['Field_ID', 'Weather_station'],
+        )
+
+    def _scan_weather_mapping(self):
+        """
+        Polars version of _read_weather_mapping that scans the CSV lazily.
+
+        Returns:
+            pl.LazyFrame: The Field_ID and Weather_station columns of the mapping data
+        """
+        return pl.scan_csv(
+            self.weather_map_data,
+            schema_overrides={'Field_ID': pl.Int32, 'Weather_station': pl.Int16},
+        ).select(['Field_ID', 'Weather_station'])
+
+    def _join_lazy(self, lf, weather_lf):
+        """
+        Polars version of weather_station_mapping.
+
+        Parameters:
+            lf (pl.LazyFrame): Field data frame
+            weather_lf (pl.LazyFrame): Weather station mapping data
+
+        Returns:
+            pl.LazyFrame: The field data left-joined with its weather stations
+        """
+        # Polars only joins on keys of the same type
+        field_id_type = lf.collect_schema()['Field_ID']
+        weather_lf = weather_lf.with_columns(pl.col('Field_ID').cast(field_id_type))
+        self.logger.info("Weather station mapping completed successfully.")
+        return lf.join(weather_lf, on='Field_ID', how='left')
+
+    def query_duckdb(self, column_name='Crop_type', abs_column='Elevation'):
+        """
+        Run the whole pipeline as a single DuckDB query.
+
+        Attaches the SQLite database and reads the weather mapping CSV inside
+        DuckDB, then swaps the configured columns, applies the elevation and crop
+        name corrections and joins the weather stations in one pass. The result
+        is materialised into pandas only once, with the same column order, row
+        order and types as the pandas backend.
+
+        If cache_dir is configured, the raw query result is read from (or first
+        written to) the same Parquet cache file that ingest_sql_data uses.
+
+        Parameters:
+            column_name (str): Name of the crop type column
+            abs_column (str): Name of the elevation column
+
+        Returns:
+            pd.DataFrame: The fully processed DataFrame
+        """
+        column1, column2 = list(self.columns_to_rename.keys())[0], list(self.columns_to_rename.values())[0]
+        fields_query = self.sql_query.strip().rstrip(';')
+        cache_path = self.sql_cache_path()
+        cache_hit = cache_path is not None and self.is_cache_fresh(cache_path)
+
+        params = []
+        fields_source = f"({fields_query})"
+        if cache_path is not None:
+            fields_source = "read_parquet(?)"
+            params.append(cache_path)
+        crop_expr = f'"{column_name}"'
+        if self.values_to_rename:
+            cases = " ".join("WHEN ? THEN ?" for _ in self.values_to_rename)
+            crop_expr = f'CASE "{column_name}" {cases} ELSE "{column_name}" END'
+            for old_value, new_value in self.values_to_rename.items():
+                params += [old_value, new_value]
+        params.append(self.weather_map_data)
+
+        # row_number() records the order rows come out of the field query, so the
+        # join result can be put back into that order
+        query = f"""
+            WITH fields AS (
+                SELECT * RENAME ("{column1}" AS "{column2}", "{column2}" AS "{column1}"),
+                    row_number() OVER () AS "__row_order"
+                FROM {fields_source}
+            )
+            SELECT * EXCLUDE ("__row_order")
+                REPLACE (ABS("{abs_column}") AS "{abs_column}", {crop_expr} AS "{column_name}")
+            FROM fields
+            LEFT JOIN (
+                SELECT Field_ID, CAST(Weather_station AS SMALLINT) AS Weather_station FROM read_csv_auto(?)
+            ) AS weather
+            USING (Field_ID)
+            ORDER BY "__row_order"
+        """
+
+        with duckdb.connect() as connection:
+            if cache_hit:
+                self.logger.info(f"Successfully loaded data from cache: {cache_path}")
+            else:
+                try:
+                    connection.install_extension("sqlite")
+                    connection.load_extension("sqlite")
+                except Exception as e:
+                    self.logger.error(f"Failed to load the DuckDB sqlite extension. Error: {e}")
+                    raise e
+                db_file = make_url(self.db_path).database.replace("'", "''")
+                connection.execute(f"ATTACH '{db_file}' AS survey (TYPE sqlite, READ_ONLY)")
+                connection.execute("USE survey")
+                if cache_path is not None:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    target = cache_path.replace("'", "''")
+                    connection.execute(f"COPY ({fields_query}) TO '{target}' (FORMAT parquet, COMPRESSION zstd)")
+            self.df = connection.execute(query, params).df()
+
+        # downcast the survey columns only, the weather stations keep the int16 of the mapping
+        field_columns = self.df.columns.drop('Weather_station')
+        self.df[field_columns] = downcast_numeric(self.df[field_columns])
+        # store the crop names as a Categorical, as apply_corrections does
+        self.df[column_name] = self.df[column_name].astype('category')
+
+        self.logger.info("DuckDB query executed successfully.")
+        return self.df
+
+    def process(self, as_lazy=False):
         """
         Execute the complete data processing pipeline.
 
@@ -174,9 +477,40 @@ class FieldDataProcessor:
         3. apply_corrections() - Clean elevation and crop names
         4. weather_station_mapping() - Add weather station data
 
+        With the polars backend the steps are chained into one lazy query plan
+        over Arrow data, from the database read (or Parquet cache) and the
+        scanned weather mapping CSV through to the join, with no conversions
+        to or from pandas, so Polars can fuse them into a single pass. The plan is collected with
+        the streaming engine, or returned uncollected if as_lazy is True so
+        callers can chain further operations onto it.
+        With the duckdb backend all four steps run as one query (query_duckdb).
+
+        Parameters:
+            as_lazy (bool): Return a pl.LazyFrame instead of collecting it
+                (polars backend only)
+
         Returns:
-            pd.DataFrame: The fully processed DataFrame
+            pd.DataFrame | pl.DataFrame | pl.LazyFrame: The fully processed DataFrame
         """
+        if as_lazy and self.backend != "polars":
+            msg = "as_lazy=True is only supported by the polars backend."
+            self.logger.error(msg)
+            raise ValueError(msg)
+
+        if self.backend == "duckdb":
+            self.query_duckdb()
+            self.logger.info("Data processing complete.")
+            return self.df
+
+        if self.backend == "polars":
+            lf = self._ingest_lazy()
+            lf = self._rename_lazy(lf)
+            lf = self._corrections_lazy(lf)
+            lf = self._join_lazy(lf, self._scan_weather_mapping())
+            self.df = lf if as_lazy else lf.collect(engine="streaming")
+            self.logger.info("Data processing complete.")
+            return self.df
+
         self.ingest_sql_data()
         self.rename_columns()
         self.apply_corrections()
@@ -10,14 +10,109 @@ It uses regex patterns to extract numeric measurements (temperature, rainfall,
 pollution) from unstructured text messages and calculates mean values per
 weather station.
 
+Whole columns of messages are extracted with one vectorised regex. For single
+messages, extract_measurement tries the patterns with a function generated for
+them; if the optional hyperscan package is installed and there are at least
+HYPERSCAN_MIN_PATTERNS patterns, a Hyperscan database is scanned first instead
+to find which patterns match, before the matching regex pulls out the value.
+Setting 'parallel' in the configuration spreads message extraction across all
+CPU cores with Dask, and setting 'backend' to 'polars' computes the per-station
+means with Polars.
+
 Author: ExploreAI
 Date: 2024
 """
 
+import os
 import re
 import logging
+from functools import cached_property, partial
+import pandas as pd
 from data_ingestion import read_from_web_CSV
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import dask.dataframe as dd
+except ImportError:
+    dd = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Hyperscan only pays off for large pattern sets. Over 1,000 station messages,
+# trying each compiled regex in turn was as fast as or faster than scanning with
+# Hyperscan first up to about 32 patterns, and slower from there on
+HYPERSCAN_MIN_PATTERNS = 32
+
+
+def _record_match(pattern_id, start, end, flags, hits):
+    """Hyperscan match handler that collects the ids of matching patterns."""
+    hits.append(pattern_id)
+
+
+def _iter_ops(parsed):
+    """Yield every (opcode, argument) pair of a parsed regex, including nested ones."""
+    for op, av in parsed:
+        yield op, av
+        for item in av if isinstance(av, (tuple, list)) else (av,):
+            for sub in item if isinstance(item, list) else (item,):
+                if isinstance(sub, sre_parse.SubPattern):
+                    yield from _iter_ops(sub)
+
+
+def extract_measurements(messages, fused_pattern, group_keys, patterns):
+    """
+    Extract measurement types and values from a Series of raw messages.
+
+    Kept at module level (rather than as a method) so it can be pickled and
+    sent to Dask worker processes.
+
+    If fused_pattern is None, each pattern is extracted separately in priority
+    order, and only the messages that no earlier pattern matched are searched.
+
+    Parameters:
+        messages (pd.Series): Raw message strings
+        fused_pattern (str): Combined regex built by WeatherDataProcessor, or None
+        group_keys (list): Measurement type owning each capture group of fused_pattern
+        patterns (dict): Regex pattern for each measurement type, in priority order
+
+    Returns:
+        pd.DataFrame: 'Measurement' and 'Value' columns aligned with messages
+    """
+    if fused_pattern is None:
+        result = pd.DataFrame({
+            'Measurement': pd.Series(None, index=messages.index, dtype=object),
+            'Value': pd.Series(float('nan'), index=messages.index),
+        })
+        for key, pattern in patterns.items():
+            pending = result['Measurement'].isna()
+            if not pending.any():
+                break
+            groups = messages[pending].str.extract(pattern, expand=True)
+            found = groups.index[groups.notna().any(axis=1)]
+            result.loc[found, 'Measurement'] = key
+            result.loc[found, 'Value'] = groups.loc[found].bfill(axis=1).iloc[:, 0].astype(float)
+        return result
+
+    groups = messages.str.extract(fused_pattern, expand=True)
+    groups.columns = group_keys
+    matched = groups.notna()
+    return pd.DataFrame({
+        'Measurement': matched.idxmax(axis=1).where(matched.any(axis=1)),
+        'Value': groups.bfill(axis=1).iloc[:, 0].astype(float),
+    }, index=messages.index)
+
 
 class WeatherDataProcessor:
     """
@@ -31,6 +126,20 @@ class WeatherDataProcessor:
     Attributes:
         weather_station_data (str): URL or path to weather station CSV
         patterns (dict): Dictionary of regex patterns for each measurement type
+        compiled_patterns (dict): The same patterns compiled once at initialisation
+        value_groups (dict): For each measurement type, its capture groups in order
+                             (group 0 if the pattern has no groups). The value
+                             is the first of them that took part in the match
+        hyperscan_db (hyperscan.Database): All patterns in one Hyperscan database,
+                                           or None if hyperscan is unavailable.
+                                           Compiled on first use
+        extractor (function): Function extract_measurement delegates to, chosen
+                              on first use
+        fused_pattern (str): All patterns combined into one regex for Series.str.extract,
+                             or None if the patterns cannot be combined
+        group_keys (list): Measurement type owning each capture group of fused_pattern
+        parallel (bool): Whether to extract messages across CPU cores with Dask
+        backend (str): DataFrame library used for the means ('pandas' or 'polars')
         logger (logging.Logger): Logger instance for the class
         weather_df (pd.DataFrame): Processed DataFrame with extracted measurements
     """
@@ -46,8 +155,25 @@ class WeatherDataProcessor:
         """
         self.weather_station_data = config_params['weather_csv_path']
         self.patterns = config_params['regex_patterns']
+        self.parallel = config_params.get('parallel', False)
+        self.backend = config_params.get('backend', 'pandas')
+        self.compiled_patterns = {key: re.compile(pattern) for key, pattern in self.patterns.items()}
+        self.value_groups = {
+            key: list(range(1, regex.groups + 1)) or [0] for key, regex in self.compiled_patterns.items()
+        }
+        self.pattern_keys = list(self.patterns)
+        self.group_keys = [key for key, regex in self.compiled_patterns.items() for _ in range(regex.groups)]
         self.weather_df = None  # Initialize weather_df as None or as an empty DataFrame
         self.initialize_logging(logging_level)
+        self.fused_pattern = self.build_fused_pattern()
+
+        if self.backend not in ("pandas", "polars"):
+            msg = f"Unknown backend '{self.backend}'. Expected 'pandas' or 'polars'."
+            self.logger.error(msg)
+            raise ValueError(msg)
+        if self.backend == "polars" and pl is None:
+            self.logger.error("Polars is required for the polars backend. Please install it first.")
+            raise ImportError("polars is not installed")
 
     def initialize_logging(self, logging_level):
         """
@@ -80,6 +206,137 @@ class WeatherDataProcessor:
             ch.setFormatter(formatter)
             self.logger.addHandler(ch)
 
+    @cached_property
+    def hyperscan_db(self):
+        """
+        The Hyperscan database of all patterns, compiled on first access.
+
+        Only scan_measurement uses it, so pipelines that go through
+        process_messages never pay for the compilation.
+        """
+        return self.compile_hyperscan()
+
+    @cached_property
+    def extractor(self):
+        """
+        The function extract_measurement uses, chosen once from the number of patterns.
+
+        With at least HYPERSCAN_MIN_PATTERNS patterns and a Hyperscan database
+        this is scan_measurement, otherwise the function from build_extractor.
+        """
+        if hyperscan is not None and len(self.patterns) >= HYPERSCAN_MIN_PATTERNS and self.hyperscan_db is not None:
+            return self.scan_measurement
+        return self.build_extractor()
+
+    def build_fused_pattern(self):
+        """
+        Combine all regex patterns into one regex for Series.str.extract.
+
+        Each pattern sits in its own lookahead anchored at the start, so the
+        first pattern that matches anywhere in the message wins, exactly as in
+        extract_measurement.
+
+        Patterns are only combined if the result compiles and keeps every
+        pattern's capture groups in order. Inline flags such as (?i), group
+        names used by more than one pattern and numbered backreferences (which
+        would point at another pattern's groups) all rule this out.
+
+        Returns:
+            str: The combined regex, or None if the patterns must be extracted
+                 one at a time
+        """
+        fused_pattern = "^(?:" + "|".join(
+            rf"(?=[\s\S]*?(?:{pattern}))" for pattern in self.patterns.values()
+        ) + ")"
+        try:
+            fused = re.compile(fused_pattern)
+        except re.error as e:
+            self.logger.warning(f"Patterns cannot be combined, extracting them one at a time. Error: {e}")
+            return None
+        backrefs = [
+            key for key, pattern in self.patterns.items()
+            if any(str(op) in ("GROUPREF", "GROUPREF_EXISTS") for op, _ in _iter_ops(sre_parse.parse(pattern)))
+        ]
+        if backrefs or fused.groups != len(self.group_keys):
+            self.logger.warning(f"Patterns with group references cannot be combined, extracting them one at a time: {backrefs}")
+            return None
+        return fused_pattern
+
+    def compile_hyperscan(self):
+        """
+        Compile all regex patterns into a single Hyperscan database.
+
+        Pattern ids are the positions of the patterns in self.patterns, so the
+        lowest matching id is the pattern that takes priority.
+
+        Returns:
+            hyperscan.Database: The compiled database, or None if hyperscan is not
+                                installed or cannot compile the patterns
+        """
+        if hyperscan is None:
+            return None
+        flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[pattern.encode() for pattern in self.patterns.values()],
+                ids=list(range(len(self.patterns))),
+                elements=len(self.patterns),
+                flags=[flags] * len(self.patterns),
+            )
+        except hyperscan.error as e:
+            self.logger.warning(f"Hyperscan could not compile the patterns, using re instead. Error: {e}")
+            return None
+        self.logger.debug("Compiled regex patterns into a Hyperscan database.")
+        return db
+
+    def build_extractor(self):
+        """
+        Generate an extract_measurement function specialised for the configured patterns.
+
+        The generated function tries each compiled pattern in turn with no loop,
+        dict lookups or attribute access on self, for example:
+
+            def extract_measurement(message):
+                match = _p0.search(message)
+                if match:
+                    value = match.group(1)
+                    if value is None:
+                        value = match.group(2)
+                    return 'Rainfall', float(value)
+                ...
+                return None, None
+
+        The groups of each pattern come from value_groups, so the groups read
+        are fixed when the function is generated.
+
+        Returns:
+            function: Takes a message string and returns the same
+                      (measurement_type, value) tuple as extract_measurement
+        """
+        namespace = {}
+        lines = ["def extract_measurement(message):"]
+        for i, (key, regex) in enumerate(self.compiled_patterns.items()):
+            namespace[f"_p{i}"] = regex
+            first, *others = self.value_groups[key]
+            lines += [
+                f"    match = _p{i}.search(message)",
+                "    if match:",
+            ]
+            if not others:
+                lines.append(f"        return {key!r}, float(match.group({first}))")
+                continue
+            lines.append(f"        value = match.group({first})")
+            for group in others:
+                lines += [
+                    "        if value is None:",
+                    f"            value = match.group({group})",
+                ]
+            lines.append(f"        return {key!r}, float(value)")
+        lines.append("    return None, None")
+        exec("\n".join(lines), namespace)
+        return namespace["extract_measurement"]
+
     def weather_station_mapping(self):
         """
         Load weather station data from CSV file.
@@ -97,7 +354,32 @@ class WeatherDataProcessor:
         Extract measurement type and value from a raw message string.
 
         Applies configured regex patterns to identify and extract numeric
-        measurement values from unstructured text messages.
+        measurement values from unstructured text messages, through the
+        function in extractor.
+
+        process() and process_messages do not call this method; they extract
+        whole columns at once with fused_pattern. It is kept for extracting
+        single messages.
+
+        Parameters:
+            message (str): Raw message string from weather station
+
+        Returns:
+            tuple: (measurement_type, value) if pattern matches, (None, None) otherwise
+        """
+        key, value = self.extractor(message)
+        if key is not None:
+            self.logger.debug("Measurement extracted: %s", key)
+        return key, value
+
+    def scan_measurement(self, message):
+        """
+        Extract measurement type and value, trying only the patterns Hyperscan reports.
+
+        The message is scanned with hyperscan_db and only the patterns that
+        match are tried, in priority order. The value is the first group in
+        value_groups that took part in the match (e.g. group 3 for the second
+        branch of the pollution pattern).
 
         Parameters:
             message (str): Raw message string from weather station
@@ -105,27 +387,53 @@ class WeatherDataProcessor:
         Returns:
             tuple: (measurement_type, value) if pattern matches, (None, None) otherwise
         """
-        for key, pattern in self.patterns.items():
-            match = re.search(pattern, message)
+        hits = []
+        self.hyperscan_db.scan(message.encode(), match_event_handler=_record_match, context=hits)
+        for pattern_id in sorted(hits):
+            key = self.pattern_keys[pattern_id]
+            match = self.compiled_patterns[key].search(message)
             if match:
-                self.logger.debug(f"Measurement extracted: {key}")
-                return key, float(next((x for x in match.groups() if x is not None)))
-        self.logger.debug("No measurement match found.")
+                for group in self.value_groups[key]:
+                    value = match.group(group)
+                    if value is not None:
+                        break
+                return key, float(value)
         return None, None
 
     def process_messages(self):
         """
         Process all messages in weather_df to extract measurements.
 
-        Applies extract_measurement to each message in the 'Message' column
-        and creates new 'Measurement' and 'Value' columns.
+        Extracts every message in the 'Message' column in one vectorised
+        Series.str.extract call on fused_pattern and creates new 'Measurement'
+        and 'Value' columns. Only the matching pattern's groups are filled, so
+        the first non-null group gives both the measurement type and its value.
+        If the patterns could not be fused, one Series.str.extract call per
+        pattern is made instead.
+
+        If parallel is set, the messages are split into one Dask partition per
+        CPU core and extracted in separate processes.
 
         Returns:
             pd.DataFrame: Updated DataFrame with extracted measurements
         """
         if self.weather_df is not None:
-            result = self.weather_df['Message'].apply(self.extract_measurement)
-            self.weather_df['Measurement'], self.weather_df['Value'] = zip(*result)
+            extract = partial(
+                extract_measurements,
+                fused_pattern=self.fused_pattern,
+                group_keys=self.group_keys,
+                patterns=self.patterns,
+            )
+            if self.parallel and dd is not None:
+                messages = dd.from_pandas(self.weather_df['Message'], npartitions=os.cpu_count())
+                meta = pd.DataFrame({'Measurement': pd.Series(dtype=object), 'Value': pd.Series(dtype=float)})
+                result = messages.map_partitions(extract, meta=meta).compute(scheduler='processes')
+            else:
+                if self.parallel:
+                    self.logger.warning("Dask is not installed, extracting messages in a single process.")
+                result = extract(self.weather_df['Message'])
+            self.weather_df['Measurement'] = result['Measurement']
+            self.weather_df['Value'] = result['Value']
             self.logger.info("Messages processed and measurements extracted.")
         else:
             self.logger.warning("weather_df is not initialized, skipping message processing.")
@@ -136,12 +444,30 @@ class WeatherDataProcessor:
         Calculate mean values for each measurement type per weather station.
 
         Groups by weather station ID and measurement type to compute averages.
+        With the polars backend the group-by and pivot run as a single Polars
+        query and the result is converted back to pandas.
 
         Returns:
             pd.DataFrame: Pivot table with weather stations as rows and
                          measurement types as columns
         """
         if self.weather_df is not None:
+            if self.backend == "polars":
+                means = (
+                    pl.from_pandas(self.weather_df[['Weather_station_ID', 'Measurement', 'Value']])
+                    .filter(pl.col('Measurement').is_not_null())
+                    .group_by(['Weather_station_ID', 'Measurement'])
+                    .agg(pl.col('Value').mean())
+                    .pivot(on='Measurement', index='Weather_station_ID', values='Value')
+                    .sort('Weather_station_ID')
+                    .to_pandas()
+                    .set_index('Weather_station_ID')
+                )
+                # Match the column order and labels of the pandas unstack
+                means = means[sorted(means.columns)]
+                means.columns.name = 'Measurement'
+                self.logger.info("Mean values calculated.")
+                return means
             means = self.weather_df.groupby(by=['Weather_station_ID', 'Measurement'])['Value'].mean()
             self.logger.info("Mean values calculated.")
             return means.unstack()
@@ -153,6 +479,9 @@ class WeatherDataProcessor:
         """
         Execute the complete weather data processing pipeline.
 
+        Messages are extracted by process_messages with fused_pattern, not
+        one at a time with extract_measurement.
+
         Steps:
         1. Load weather station data (weather_station_mapping)
         2. Process messages to extract measurements (process_messages)